@@ -8,31 +8,124 @@ Email: orders@igboechejohn@gmail.com
 
 # --- Imports ---
 from flask import Flask, request, jsonify, render_template, redirect, url_for
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
+from celery import Celery, Task
 # from flask_bcrypt import Bcrypt
 # from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from decimal import Decimal
 import os
+import re
+import sys
+import math
+import io
+import gzip
+import zlib
 import json
+import orjson
+import uuid
+import time
+import queue
+import atexit
+import threading
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+import redis
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from werkzeug.wsgi import get_input_stream
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from kombu.exceptions import OperationalError as BrokerError
 import smtplib
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 # import africastalking # For SMS notifications to Nigerian numbers
 
 
+# --- JSON Serialization ---
+def orjson_default(obj):
+    """Serialize types orjson does not handle natively (Numeric columns)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class ORJSONProvider(JSONProvider):
+    """Encode and decode request/response bodies with orjson"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=orjson_default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the base implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=orjson_default), mimetype='application/json')
+
+
+# --- Request Decompression ---
+class GzipRequestMiddleware:
+    """Inflate gzip-encoded request bodies (Content-Encoding: gzip) before Flask reads them"""
+    def __init__(self, wsgi_app, max_size):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            try:
+                # Read one byte past the limit so oversized (or zip-bomb) bodies are caught without inflating them fully
+                body = gzip.GzipFile(fileobj=get_input_stream(environ)).read(self.max_size + 1)
+            except (OSError, EOFError, zlib.error):
+                return self._error(environ, start_response, 400, 'Invalid gzip request body')
+            if len(body) > self.max_size:
+                return self._error(environ, start_response, 413, 'Request body too large')
+
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    def _error(self, environ, start_response, status, message):
+        response = app.response_class(orjson.dumps({'error': message}), status=status, mimetype='application/json')
+        return response(environ, start_response)
+
+
 # --- Initialization ---
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # --- Configuration ---
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+database_url = app.config['SQLALCHEMY_DATABASE_URI'] or ''
+if not database_url.startswith('sqlite'):
+    # Enough pooled connections for concurrent sensor POSTs; drop stale ones before use
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 40)),
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'pool_use_lifo': True
+    }
+    if database_url.startswith('postgres'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {'application_name': 'smartfarm'}
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-string')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+app.config['TEMPLATES_AUTO_RELOAD'] = os.environ.get('FLASK_ENV') == 'development' # Keep compiled templates cached in production
+app.config['SENSOR_BATCH_SIZE'] = int(os.environ.get('SENSOR_BATCH_SIZE', 500))
+app.config['SENSOR_FLUSH_INTERVAL'] = float(os.environ.get('SENSOR_FLUSH_INTERVAL', 0.2))
+app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL', os.environ.get('REDIS_URL'))
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['WEATHER_CACHE_TTL'] = int(os.environ.get('WEATHER_CACHE_TTL', 600))
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 86400))
+app.config['DELTA_BASE_TTL'] = int(os.environ.get('DELTA_BASE_TTL', 86400))
+app.config['GZIP_MAX_REQUEST_SIZE'] = int(os.environ.get('GZIP_MAX_REQUEST_SIZE', 10 * 1024 * 1024))
 
 # --- Contact Information ---
 SUPPORT_PHONE = "+2348169849839"
@@ -40,15 +133,48 @@ SUPPORT_EMAIL = "igboechejohn@gmail.com"
 BUSINESS_NAME = "Smart Farm Nigeria"
 
 # --- Initialize Extensions ---
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, app.config['GZIP_MAX_REQUEST_SIZE'])
 db = SQLAlchemy(app)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1) # argon2-cffi releases the GIL while hashing
 # bcrypt = Bcrypt(app)
 # jwt = JWTManager(app)
 CORS(app)
+redis_client = redis.Redis.from_url(app.config['REDIS_URL']) if app.config['REDIS_URL'] else None
+http_session = requests.Session() # Keep-alive connections for outbound API calls
+http_session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=64))
+http_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=64))
 
 # --- Configure Logging ---
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
 logger = logging.getLogger(__name__)
 
+# --- Background Tasks (Celery) ---
+class FlaskTask(Task):
+    """Run every task inside the Flask application context"""
+    def __call__(self, *args, **kwargs):
+        with app.app_context():
+            return self.run(*args, **kwargs)
+
+celery = Celery('smartfarm', broker=app.config['CELERY_BROKER_URL'], task_cls=FlaskTask)
+celery.conf.update(
+    # Without a broker (local development) tasks run inline in the caller
+    task_always_eager=app.config['CELERY_BROKER_URL'] is None,
+    task_acks_late=True,
+    task_routes={
+        'smartfarm.send_sms_notification': {'queue': 'sms_queue'},
+        'smartfarm.send_email_notification': {'queue': 'email_queue'},
+        'smartfarm.notify_order_received': {'queue': 'email_queue'},
+        'smartfarm.update_weather_data': {'queue': 'weather_queue'},
+    },
+)
+
+def enqueue_task(task, *args):
+    """Queue a Celery task; a broker outage is logged rather than failing the caller"""
+    try:
+        task.delay(*args)
+    except (BrokerError, redis.RedisError) as e:
+        logger.error(f"Failed to queue {task.name}: {str(e)}")
+
 # --- AfricasTalking SMS configuration (for Nigerian SMS) ---
 username = "smartfarm" # Replace with your username
 api_key = "your-africastalking-api-key" # Replace with your API key
@@ -56,6 +182,12 @@ api_key = "your-africastalking-api-key" # Replace with your API key
 # africastalking.initialize(username, api_key)
 # sms = africastalking.SMS
 
+# --- SMTP configuration ---
+smtp_server = "smtp.gmail.com" # Configure your SMTP server
+smtp_port = 587
+email_user = "igboechejohn@gmail.com" # Your email
+email_password = "your-email-password" # Your email password
+
 
 
 # --- Database Models ---
@@ -100,6 +232,10 @@ class Device(db.Model):
     configuration = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_devices_user_active', 'user_id', 'is_active'),
+    )
+
 class SensorData(db.Model):
     __tablename__ = 'sensor_data'
     id = db.Column(db.Integer, primary_key=True)
@@ -122,6 +258,12 @@ class SensorData(db.Model):
     is_predicted = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Latest-reading lookups per device (compression) and per user (dashboard)
+    __table_args__ = (
+        db.Index('idx_device_timestamp', 'device_id', 'timestamp'),
+        db.Index('idx_user_timestamp', 'user_id', 'timestamp'),
+    )
+
 class Order(db.Model):
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
@@ -165,154 +307,438 @@ class Alert(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     resolved_at = db.Column(db.DateTime)
 
+    # Unread alerts per user, newest first (dashboard)
+    __table_args__ = (
+        db.Index('idx_user_unread_created', 'user_id', 'is_read', 'created_at'),
+    )
+
 
 # --- Utility Functions ---
-def send_sms_notification(phone_number, message):
+def verify_password(user, password):
+    """Check a login password; legacy Werkzeug hashes are upgraded to argon2 on success"""
+    if user.password_hash.startswith('$argon2'):
+        try:
+            password_hasher.verify(user.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        # Only re-hash when the configured cost has changed
+        if password_hasher.check_needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+        return True
+
+    if check_password_hash(user.password_hash, password):
+        user.password_hash = password_hasher.hash(password)
+        db.session.commit()
+        return True
+    return False
+
+NIGERIA_PREFIX_RE = re.compile(r'^(?:\+234|0)')
+
+def format_nigerian_phone(phone_number):
+    """Convert +234... and local 0... numbers to the 234... form AfricasTalking expects"""
+    return NIGERIA_PREFIX_RE.sub('234', phone_number, count=1)
+
+_order_prefix = (None, '')
+
+def order_number_prefix():
+    """Get today's order number prefix (SFyyyymmdd), formatted once per day"""
+    global _order_prefix
+    today = date.today()
+    if _order_prefix[0] != today:
+        _order_prefix = (today, f"SF{today:%Y%m%d}")
+    return _order_prefix[1]
+
+ORDER_NUMBER_ATTEMPTS = 3
+
+def new_order_number():
+    """Build an order number: today's prefix plus 10 random hex characters (fills the 20-char column)"""
+    return f"{order_number_prefix()}{uuid.uuid4().hex[:10].upper()}"
+
+@celery.task(bind=True, name='smartfarm.send_sms_notification', max_retries=3)
+def send_sms_notification(self, phone_number, message):
     """Send SMS notification using AfricasTalking for Nigerian numbers"""
+    # A missing number will not turn up on retry
+    if not isinstance(phone_number, str) or not phone_number.strip():
+        logger.error(f"Failed to send SMS: no phone number ({phone_number!r})")
+        return False
+
     try:
         # Format phone number for Nigeria
-        if phone_number.startswith('+234'):
-            phone_number = phone_number[1:] # Remove + for AfricasTalking
-        elif phone_number.startswith('0'):
-            phone_number = '234' + phone_number[1:] # Convert local format
+        phone_number = format_nigerian_phone(phone_number)
         # response = sms.send(message, [phone_number])
         # logger.info(f"SMS sent to {phone_number}: {response}")
         # return True
         return False # Placeholder since AfricasTalking is commented out
-    except Exception as e:
+    except (requests.RequestException, OSError) as e:
         logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
-        return False
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
 
-def send_email_notification(to_email, subject, body):
+class SMTPPool:
+    """Pool of SMTP connections kept open across emails (TLS handshake and login once each)"""
+
+    def __init__(self, size):
+        self._pool = queue.Queue()
+        for _ in range(size):
+            self._pool.put(None) # Connections are opened on first use
+
+    def _connect(self):
+        server = smtplib.SMTP(smtp_server, smtp_port, timeout=30)
+        server.starttls()
+        # server.login(email_user, email_password)
+        return server
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _quit(server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def send(self, msg):
+        """Send a message on a pooled connection, replacing it if the server dropped it"""
+        server = self._pool.get()
+        try:
+            if server is None or not self._is_alive(server):
+                self._quit(server)
+                server = None
+                server = self._connect()
+            # server.send_message(msg)
+        except (smtplib.SMTPException, OSError):
+            self._quit(server)
+            server = None
+            raise
+        finally:
+            self._pool.put(server)
+
+    def close(self):
+        """Close every open connection (used at shutdown)"""
+        for _ in range(self._pool.qsize()):
+            self._quit(self._pool.get_nowait())
+            self._pool.put(None)
+
+
+smtp_pool = SMTPPool(int(os.environ.get('SMTP_POOL_SIZE', 4)))
+atexit.register(smtp_pool.close)
+
+@celery.task(bind=True, name='smartfarm.send_email_notification', max_retries=3)
+def send_email_notification(self, to_email, subject, body):
     """Send email notification"""
     try:
-        smtp_server = "smtp.gmail.com" # Configure your SMTP server
-        smtp_port = 587
-        email_user = "igboechejohn@gmail.com" # Your email
-        email_password = "your-email-password" # Your email password
-
-        msg = MIMEMultipart()
+        msg = MIMEText(body, 'html')
         msg['From'] = email_user
         msg['To'] = to_email
         msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
 
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        # server.login(email_user, email_password)
-        text = msg.as_string()
-        # server.sendmail(email_user, to_email, text)
-        server.quit()
+        smtp_pool.send(msg)
         logger.info(f"Email sent to {to_email}")
         # return True
         return False # Placeholder since email is commented out
-    except Exception as e:
+    except (smtplib.SMTPException, OSError) as e:
         logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return False
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
 
-def notify_order_received(order):
+@celery.task(name='smartfarm.notify_order_received')
+def notify_order_received(order_id):
     """Send notifications when order is received"""
+    order = db.session.get(Order, order_id)
+    if not order:
+        return
+
     # SMS to customer
     customer_message = f"Hi {order.customer_name}! Your Smart Farm order #{order.order_number} has been received. Total: ₦{order.total_amount}. We'll call you shortly at {order.customer_phone} to confirm details. Thank you! 🌱"
-    send_sms_notification(order.customer_phone, customer_message)
+    enqueue_task(send_sms_notification, order.customer_phone, customer_message)
 
     # SMS to admin
     admin_message = f"New Smart Farm order received! Order #{order.order_number} from {order.customer_name} ({order.customer_phone}). Type: {order.order_type}. Amount: ₦{order.total_amount}. Call customer to confirm."
-    send_sms_notification(SUPPORT_PHONE, admin_message)
+    enqueue_task(send_sms_notification, SUPPORT_PHONE, admin_message)
 
     # Email to customer
     email_subject = f"Order Confirmation - Smart Farm #{order.order_number}"
-    email_body = f"""
-    <html>
-    <body>
-    <h2>🌱 Smart Farm Order Confirmation</h2>
-    <p>Dear {order.customer_name},</p>
-    <p>Thank you for your order! We have received your Smart Farm system order and our team will contact you shortly.</p>
-    <div style="background: #f1f8e9; padding: 20px; border-radius: 10px; margin: 20px 0;">
-    <h3>Order Details:</h3>
-    <p><strong>Order Number:</strong> {order.order_number}</p>
-    <p><strong>Order Type:</strong> {order.order_type.replace('_', ' ').title()}</p>
-    <p><strong>Total Amount:</strong> ₦{order.total_amount}</p>
-    <p><strong>Status:</strong> {order.order_status.title()}</p>
-    </div>
-    <h3>📞 What Happens Next?</h3>
-    <ol>
-    <li>Our team will call you at <strong>{order.customer_phone}</strong> within 2 hours</li>
-    <li>We'll confirm your order details and shipping address</li>
-    <li>Payment instructions will be provided</li>
-    <li>Your hardware will be shipped within 1-3 business days</li>
-    </ol>
-    <div style="background: #4caf50; color: white; padding: 15px; border-radius: 8px; margin: 20px 0;">
-    <h3>📞 Need Immediate Help?</h3>
-    <p><strong>Call/WhatsApp:</strong> {SUPPORT_PHONE}</p>
-    <p><strong>Email:</strong> {SUPPORT_EMAIL}</p>
-    <p><strong>Business Hours:</strong> Mon-Sat 8AM-8PM, Sun 10AM-6PM</p>
-    </div>
-    <p>Thank you for choosing Smart Farm Nigeria!</p>
-    <p>Best regards,<br>Smart Farm Team</p>
-    </body>
-    </html>
-    """
-    send_email_notification(order.customer_email, email_subject, email_body)
+    email_body = render_template('email/order_confirmation.html', order=order,
+                                 support_phone=SUPPORT_PHONE, support_email=SUPPORT_EMAIL)
+    enqueue_task(send_email_notification, order.customer_email, email_subject, email_body)
+
+def weather_cell(lat, lng):
+    """Round coordinates to ~1km; weather is shared by every device in the cell"""
+    return round(float(lat), 2), round(float(lng), 2)
 
 def get_weather_data(lat, lng):
-    """Get weather data from OpenWeatherMap API"""
+    """Get weather data from OpenWeatherMap API (cached in Redis per weather cell)"""
+    lat, lng = weather_cell(lat, lng)
+    cache_key = f"wx:{lat}:{lng}"
+
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            logger.error(f"Weather cache error: {str(e)}")
+
     try:
         api_key = os.environ.get('OPENWEATHER_API_KEY', 'your-api-key')
         url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lng}&appid={api_key}&units=metric"
-        response = requests.get(url, timeout=10)
-        return response.json() if response.status_code == 200 else None
+        response = http_session.get(url, timeout=(2, 5)) # (connect, read)
+        if response.status_code != 200:
+            return None
+        weather_data = response.json()
     except Exception as e:
         logger.error(f"Weather API error: {str(e)}")
         return None
 
-def calculate_compression_ratio(device_id, new_data):
-    """Calculate data compression ratio based on predictive algorithm"""
+    if redis_client is not None:
+        try:
+            redis_client.setex(cache_key, app.config['WEATHER_CACHE_TTL'], json.dumps(weather_data))
+        except redis.RedisError as e:
+            logger.error(f"Weather cache error: {str(e)}")
+    return weather_data
+
+@celery.task(name='smartfarm.update_weather_data')
+def update_weather_data(sensor_ids, lat, lng):
+    """Fill in the weather columns of already stored sensor readings"""
+    weather_data = get_weather_data(lat, lng)
+    if not weather_data:
+        return
+
+    SensorData.query.filter(SensorData.id.in_(sensor_ids)).update({
+        'weather_temperature': weather_data.get('main', {}).get('temp'),
+        'weather_humidity': weather_data.get('main', {}).get('humidity'),
+        'weather_pressure': weather_data.get('main', {}).get('pressure'),
+        'weather_description': weather_data.get('weather', [{}])[0].get('description')
+    }, synchronize_session=False)
+    db.session.commit()
+
+# Fields compared by the predictive compression check, and how far each may move
+COMPRESSION_FIELDS = ('temperature', 'humidity', 'soil_moisture', 'light_intensity')
+COMPRESSION_THRESHOLDS = np.array([1.0, 2.0, 1.5, 50.0])
+
+# device_id -> last reading's COMPRESSION_FIELDS; readings reach the database later in batches
+last_readings = {}
+_last_readings_lock = threading.Lock()
+
+def load_last_reading(device_id):
+    """Get the newest stored reading of a device as an array of COMPRESSION_FIELDS"""
+    row = db.session.execute(
+        db.select(*[getattr(SensorData, field) for field in COMPRESSION_FIELDS])
+        .where(SensorData.device_id == device_id)
+        .order_by(SensorData.timestamp.desc()).limit(1)
+    ).first()
+    return np.array([float(value or 0) for value in row]) if row else None
+
+def calculate_compression_ratios(device_ids, readings):
+    """Calculate data compression ratios for a batch of readings based on predictive algorithm"""
     try:
-        # Get last reading for comparison
-        last_reading = SensorData.query.filter_by(device_id=device_id).order_by(SensorData.timestamp.desc()).first()
-
-        if not last_reading:
-            return 0.0, False # No compression for first reading
-
-        # Check if values are within prediction thresholds
-        temp_diff = abs(float(last_reading.temperature or 0) - float(new_data.get('temperature', 0)))
-        humidity_diff = abs(float(last_reading.humidity or 0) - float(new_data.get('humidity', 0)))
-        moisture_diff = abs(float(last_reading.soil_moisture or 0) - float(new_data.get('soil_moisture', 0)))
-        light_diff = abs(float(last_reading.light_intensity or 0) - float(new_data.get('light_intensity', 0)))
-
-        # Define thresholds for prediction
-        if (temp_diff < 1.0 and humidity_diff < 2.0 and
-            moisture_diff < 1.5 and light_diff < 50):
-            return 85.0, True # High compression - data was predicted
-        else:
-            return 65.0, False # Lower compression - actual transmission needed
+        current = np.array([[float(reading.get(field) or 0) for field in COMPRESSION_FIELDS]
+                            for reading in readings]).reshape(-1, len(COMPRESSION_FIELDS))
+        previous = np.zeros_like(current)
+        has_previous = np.zeros(len(readings), dtype=bool)
+
+        # Devices missing from the cache are looked up in the database without holding the lock
+        with _last_readings_lock:
+            missing = {device_id for device_id in device_ids if device_id not in last_readings}
+        loaded = {device_id: load_last_reading(device_id) for device_id in missing}
+
+        # Each reading is compared with the one before it from the same device,
+        # which may be earlier in this same batch (or stored by another request meanwhile)
+        with _last_readings_lock:
+            for i, device_id in enumerate(device_ids):
+                last = last_readings.get(device_id)
+                if last is None:
+                    last = loaded.get(device_id)
+                if last is not None:
+                    previous[i] = last
+                    has_previous[i] = True
+                last_readings[device_id] = current[i]
+
+        # Predicted when every field stays within its threshold
+        predicted = has_previous & (np.abs(current - previous) < COMPRESSION_THRESHOLDS).all(axis=1)
+        ratios = np.where(predicted, 85.0, np.where(has_previous, 65.0, 0.0)) # No compression for first reading
+        return ratios, predicted
     except Exception as e:
         logger.error(f"Compression calculation error: {str(e)}")
-        return 0.0, False
+        return np.zeros(len(readings)), np.zeros(len(readings), dtype=bool)
 
-def check_sensor_alerts(user_id, device_id, sensor_data):
-    """Check sensor data against thresholds and create alerts"""
+def calculate_compression_ratio(device_id, new_data):
+    """Calculate data compression ratio based on predictive algorithm"""
+    ratios, predicted = calculate_compression_ratios([device_id], [new_data])
+    return float(ratios[0]), bool(predicted[0])
+
+# Reading fields a delta upload may leave out when they have not changed
+SENSOR_FIELDS = ('temperature', 'humidity', 'soil_moisture', 'light_intensity', 'ph_level',
+                 'battery_level', 'signal_strength', 'latitude', 'longitude')
+
+def validate_sensor_ids(data):
+    """Check a reading's device_id and user_id fit their columns; raises ValueError naming the bad field"""
+    device_id = data['device_id']
+    if not isinstance(device_id, str) or not 0 < len(device_id) <= SensorData.device_id.type.length:
+        raise ValueError(f'device_id must be a string of at most {SensorData.device_id.type.length} characters')
+    if isinstance(data['user_id'], bool) or not isinstance(data['user_id'], int):
+        raise ValueError('user_id must be an integer')
+
+def parse_sensor_values(data):
+    """Convert a reading's SENSOR_FIELDS to numbers that fit their columns; raises ValueError naming the bad field"""
+    values = {}
+    for field in SENSOR_FIELDS:
+        value = data.get(field)
+        if value is None:
+            values[field] = None
+            continue
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{field} must be a number')
+        if not math.isfinite(number):
+            raise ValueError(f'{field} must be a finite number')
+
+        column_type = SensorData.__table__.c[field].type
+        if isinstance(column_type, db.Integer):
+            if not number.is_integer() or abs(number) >= 2 ** 31:
+                raise ValueError(f'{field} must be a 32-bit integer')
+            values[field] = int(number)
+        else:
+            # Numeric(p, s) holds magnitudes below 10 ** (p - s) once rounded to s decimals
+            if abs(round(number, column_type.scale)) >= 10 ** (column_type.precision - column_type.scale):
+                raise ValueError(f'{field} is out of range')
+            values[field] = number
+    return values
+
+def validate_sensor_seq(data):
+    """Check a reading's optional 'seq' (and a delta's 'base_seq') are integers; raises ValueError naming the bad field"""
+    for field in ('seq', 'base_seq'):
+        value = data.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError(f'{field} must be an integer')
+
+# device_id -> last accepted reading's SENSOR_FIELDS plus its 'seq', the base delta uploads are merged onto.
+# Only used without Redis; with several workers a delta then lands on a stale base and is answered 409.
+last_payloads = {}
+_last_payloads_lock = threading.Lock()
+
+def get_delta_bases(device_ids):
+    """Get the bases the devices' next deltas merge onto (device_id -> base or None); one Redis round trip when shared"""
+    device_ids = list(device_ids)
+    if not device_ids:
+        return {}
+    if redis_client is None:
+        with _last_payloads_lock:
+            return {device_id: last_payloads.get(device_id) for device_id in device_ids}
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return
-
-        # Default thresholds
-        thresholds = {
-            'temperature_min': 5,
-            'temperature_max': 35,
-            'moisture_min': 30,
-            'moisture_max': 80,
-            'humidity_min': 40,
-            'humidity_max': 90
-        }
+        bases = redis_client.mget([f"sensor_base:{device_id}" for device_id in device_ids])
+    except redis.RedisError as e:
+        logger.error(f"Delta base error: {str(e)}")
+        return dict.fromkeys(device_ids)
+    return {device_id: orjson.loads(base) if base is not None else None for device_id, base in zip(device_ids, bases)}
+
+def get_delta_base(device_id):
+    """Get the base a device's next delta is merged onto"""
+    return get_delta_bases([device_id])[device_id]
+
+def set_delta_bases(bases):
+    """Remember accepted readings (device_id -> base) for the devices' next deltas, in one Redis round trip"""
+    if not bases:
+        return
+    if redis_client is None:
+        with _last_payloads_lock:
+            last_payloads.update(bases)
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for device_id, base in bases.items():
+            pipe.set(f"sensor_base:{device_id}", orjson.dumps(base), ex=app.config['DELTA_BASE_TTL'])
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Delta base error: {str(e)}")
+
+def set_delta_base(device_id, base):
+    """Remember a device's accepted reading as the base for its next delta"""
+    set_delta_bases({device_id: base})
+
+def merge_delta(data, base):
+    """Merge a delta onto its base; None when the base is missing or not the reading the device diffed against"""
+    if data.get('base_seq') is None or base is None or base.get('seq') != data['base_seq']:
+        return None
+    return {**base, **data, 'seq': data.get('seq')}
+
+# Default thresholds
+ALERT_THRESHOLDS = {
+    'temperature_min': 5,
+    'temperature_max': 35,
+    'moisture_min': 30,
+    'moisture_max': 80,
+    'humidity_min': 40,
+    'humidity_max': 90
+}
+
+def load_user_profile(user_id):
+    """Get (phone, farm_type) for a user from the database, None if unknown"""
+    row = db.session.execute(db.select(User.phone, User.farm_type).where(User.id == user_id)).first()
+    return (row.phone, row.farm_type) if row else None
+
+@lru_cache(maxsize=10000)
+def _get_user_local(user_id):
+    # Raising keeps unknown ids out of the cache (lru_cache does not store exceptions)
+    profile = load_user_profile(user_id)
+    if profile is None:
+        raise LookupError(user_id)
+    return profile
+
+def get_user_cached(user_id):
+    """Get (phone, farm_type) for a user, cached in Redis (shared by all workers) or in-process"""
+    if redis_client is None:
+        try:
+            return _get_user_local(user_id)
+        except LookupError:
+            return None
+
+    key = f"users:{user_id}"
+    try:
+        phone, farm_type = redis_client.hmget(key, 'phone', 'farm_type')
+        if phone is not None:
+            return phone.decode(), farm_type.decode()
+    except redis.RedisError as e:
+        logger.error(f"User cache error: {str(e)}")
+        return load_user_profile(user_id)
+
+    profile = load_user_profile(user_id)
+    if profile is not None:
+        try:
+            redis_client.hset(key, mapping={'phone': profile[0], 'farm_type': profile[1]})
+            redis_client.expire(key, app.config['USER_CACHE_TTL'])
+        except redis.RedisError as e:
+            logger.error(f"User cache error: {str(e)}")
+    return profile
+
+def invalidate_user_cache(user_id):
+    """Drop cached profile data after a user row is written"""
+    # The in-process cache never holds unknown ids, so a new row needs no clearing there;
+    # code that changes an existing row's phone or farm_type must also call _get_user_local.cache_clear()
+    if redis_client is not None:
+        try:
+            redis_client.delete(f"users:{user_id}")
+        except redis.RedisError as e:
+            logger.error(f"User cache error: {str(e)}")
 
+def check_sensor_alerts(user_id, device_id, sensor_data):
+    """Check sensor data against thresholds and return the Alert rows to create (not committed)"""
+    try:
+        thresholds = ALERT_THRESHOLDS
         alerts_to_create = []
 
         # Check temperature
-        if sensor_data.temperature:
-            temp = float(sensor_data.temperature)
+        if sensor_data.get('temperature'):
+            temp = float(sensor_data['temperature'])
             if temp < thresholds['temperature_min']:
                 alerts_to_create.append({
                     'type': 'temperature_low',
@@ -333,8 +759,8 @@ def check_sensor_alerts(user_id, device_id, sensor_data):
                 })
 
         # Check soil moisture
-        if sensor_data.soil_moisture:
-            moisture = float(sensor_data.soil_moisture)
+        if sensor_data.get('soil_moisture'):
+            moisture = float(sensor_data['soil_moisture'])
             if moisture < thresholds['moisture_min']:
                 alerts_to_create.append({
                     'type': 'moisture_low',
@@ -345,31 +771,149 @@ def check_sensor_alerts(user_id, device_id, sensor_data):
                     'threshold_value': thresholds['moisture_min']
                 })
 
-        # Create alerts and send notifications
-        for alert_data in alerts_to_create:
-            alert = Alert(
-                user_id=user_id,
-                device_id=device_id,
-                alert_type=alert_data['type'],
-                severity=alert_data['severity'],
-                title=alert_data['title'],
-                message=alert_data['message'],
-                current_value=alert_data['current_value'],
-                threshold_value=alert_data['threshold_value']
-            )
-            db.session.add(alert)
-
-            # Send SMS notification for critical alerts
-            if alert_data['severity'] == 'critical':
-                sms_message = f"🚨 Smart Farm Alert: {alert_data['title']} - {alert_data['message']} Call {SUPPORT_PHONE} for help."
-                send_sms_notification(user.phone, sms_message)
-
-        if alerts_to_create:
-            db.session.commit()
-            logger.info(f"Created {len(alerts_to_create)} alerts for user {user_id}")
+        return [Alert(
+            user_id=user_id,
+            device_id=device_id,
+            alert_type=alert_data['type'],
+            severity=alert_data['severity'],
+            title=alert_data['title'],
+            message=alert_data['message'],
+            current_value=alert_data['current_value'],
+            threshold_value=alert_data['threshold_value']
+        ) for alert_data in alerts_to_create]
 
     except Exception as e:
         logger.error(f"Alert checking error: {str(e)}")
+        return []
+
+def notify_critical_alerts(critical_alerts):
+    """Send SMS notification for committed critical alerts, given as (user_id, title, message)"""
+    for user_id, title, message in critical_alerts:
+        profile = get_user_cached(user_id)
+        if profile is None:
+            continue
+        sms_message = f"🚨 Smart Farm Alert: {title} - {message} Call {SUPPORT_PHONE} for help."
+        enqueue_task(send_sms_notification, profile[0], sms_message)
+
+
+# --- Sensor Data Batching ---
+class SensorDataBatcher:
+    """Queue sensor readings and write them to the database in batches"""
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, row):
+        """Queue one sensor_data row (a column -> value dict); the device's last_seen follows its timestamp"""
+        self._ensure_started()
+        self._queue.put(row)
+
+    def _ensure_started(self):
+        # Started lazily so every gunicorn worker gets its own writer thread after fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sensor-writer', daemon=True)
+                self._thread.start()
+
+    def _drain(self, block=True):
+        """Collect up to batch_size rows, waiting at most flush_interval after the first"""
+        batch = []
+        try:
+            batch.append(self._queue.get(block=block))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + (self.flush_interval if block else 0)
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            try:
+                self._write(batch)
+            except Exception as e:
+                # The rows are committed by now (write errors are handled inside); keep the thread alive
+                logger.error(f"Sensor batch follow-up error ({len(batch)} rows): {str(e)}")
+
+    def flush(self):
+        """Write everything still queued (used at shutdown)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        # One last_seen per device: the newest reading in this batch
+        last_seen = {row['device_id']: row['timestamp'] for row in batch}
+
+        with app.app_context():
+            try:
+                if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+                    # Core executemany; skips ORM unit-of-work bookkeeping for every row
+                    sensor_data = SensorData.__table__
+                    sensor_ids = db.session.execute(
+                        db.insert(sensor_data).returning(sensor_data.c.id, sort_by_parameter_order=True),
+                        batch
+                    ).scalars().all()
+                else:
+                    # MySQL has no INSERT ... RETURNING; the ORM fetches each row's id instead.
+                    # Copies keep the queued rows free of ids for the one-by-one retry below.
+                    mappings = [dict(row) for row in batch]
+                    db.session.bulk_insert_mappings(SensorData, mappings, return_defaults=True)
+                    sensor_ids = [mapping['id'] for mapping in mappings]
+                devices = Device.__table__
+                db.session.execute(
+                    devices.update()
+                    .where(devices.c.device_id == db.bindparam('b_device_id'))
+                    .values(last_seen=db.bindparam('b_last_seen')),
+                    [{'b_device_id': device_id, 'b_last_seen': ts} for device_id, ts in last_seen.items()]
+                )
+
+                # Alerts go into the same transaction: one commit per batch
+                alerts = []
+                for row in batch:
+                    alerts.extend(check_sensor_alerts(row['user_id'], row['device_id'], row))
+                db.session.add_all(alerts)
+                # Read before commit; committed objects expire and would reload one by one
+                critical_alerts = [(alert.user_id, alert.title, alert.message)
+                                   for alert in alerts if alert.severity == 'critical']
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Sensor batch write error ({len(batch)} rows): {str(e)}")
+                if len(batch) > 1:
+                    # Every row was already acknowledged; write them one by one so only the bad row is lost
+                    for row in batch:
+                        self._write([row])
+                return
+
+            if alerts:
+                logger.info(f"Created {len(alerts)} alerts for {len(batch)} readings")
+                notify_critical_alerts(critical_alerts)
+
+            # Weather is looked up once per weather cell, off the request path
+            locations = {}
+            for row, sensor_id in zip(batch, sensor_ids):
+                if row['latitude'] is not None and row['longitude'] is not None:
+                    locations.setdefault(weather_cell(row['latitude'], row['longitude']), []).append(sensor_id)
+            for (lat, lng), sensor_ids in locations.items():
+                enqueue_task(update_weather_data, sensor_ids, lat, lng)
+
+
+sensor_batcher = SensorDataBatcher(app.config['SENSOR_BATCH_SIZE'], app.config['SENSOR_FLUSH_INTERVAL'])
+atexit.register(sensor_batcher.flush)
 
 
 # --- API Routes ---
@@ -396,7 +940,7 @@ def register():
                 return jsonify({'error': f'{field} is required'}), 400
 
         # Check if user already exists
-        if User.query.filter_by(email=data['email']).first():
+        if db.session.query(User.query.filter_by(email=data['email']).exists()).scalar():
             return jsonify({'error': 'Email already registered'}), 400
 
         # Validate phone number format
@@ -409,17 +953,18 @@ def register():
             name=data['name'],
             email=data['email'],
             phone=phone,
-            password_hash=generate_password_hash(data['password']),
+            password_hash=password_hasher.hash(data['password']),
             farm_type=data['farm_type'],
             location=data['location'],
             farm_size=data.get('farm_size')
         )
         db.session.add(user)
         db.session.commit()
+        invalidate_user_cache(user.id)
 
         # Send welcome SMS
         welcome_message = f"Welcome to Smart Farm Nigeria, {data['name']}! Your account has been created. Call {SUPPORT_PHONE} for hardware setup assistance. Happy farming! 🌱"
-        send_sms_notification(phone, welcome_message)
+        enqueue_task(send_sms_notification, phone, welcome_message)
 
         logger.info(f"New user registered: {data['email']} ({phone})")
         return jsonify({
@@ -443,7 +988,7 @@ def login():
             return jsonify({'error': 'Email and password required'}), 400
 
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user, password):
             # access_token = create_access_token(identity=user.id)
             return jsonify({
                 # 'access_token': access_token,
@@ -475,83 +1020,184 @@ def receive_sensor_data():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
 
-        # Get weather data if location provided
-        weather_data = None
-        if 'latitude' in data and 'longitude' in data:
-            weather_data = get_weather_data(data['latitude'], data['longitude'])
-
-        # Calculate compression ratio
-        compression_ratio, is_predicted = calculate_compression_ratio(data['device_id'], data)
-
-        # Create sensor data record
-        sensor_record = SensorData(
-            user_id=data['user_id'],
-            device_id=data['device_id'],
-            temperature=data.get('temperature'),
-            humidity=data.get('humidity'),
-            soil_moisture=data.get('soil_moisture'),
-            light_intensity=data.get('light_intensity'),
-            ph_level=data.get('ph_level'),
-            battery_level=data.get('battery_level'),
-            signal_strength=data.get('signal_strength'),
-            latitude=data.get('latitude'),
-            longitude=data.get('longitude'),
-            weather_temperature=weather_data.get('main', {}).get('temp') if weather_data else None,
-            weather_humidity=weather_data.get('main', {}).get('humidity') if weather_data else None,
-            weather_pressure=weather_data.get('main', {}).get('pressure') if weather_data else None,
-            weather_description=weather_data.get('weather', [{}])[0].get('description') if weather_data else None,
-            compression_ratio=compression_ratio,
-            is_predicted=is_predicted
-        )
-        db.session.add(sensor_record)
+        return queue_sensor_reading(data)
+    except Exception as e:
+        logger.error(f"Sensor data error: {str(e)}")
+        return jsonify({'error': 'Failed to process sensor data'}), 500
 
-        # Update device last_seen
-        device = Device.query.filter_by(device_id=data['device_id']).first()
-        if device:
-            device.last_seen = datetime.utcnow()
+@app.route('/api/sensor-data/delta', methods=['POST'])
+def receive_sensor_delta():
+    """Receive sensor data carrying only the fields changed since the device's last upload"""
+    try:
+        data = request.get_json()
 
-        db.session.commit()
+        # Validate required fields
+        required_fields = ['device_id', 'user_id']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'{field} is required'}), 400
+        try:
+            validate_sensor_ids(data)
+            validate_sensor_seq(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        # Check for alerts
-        check_sensor_alerts(data['user_id'], data['device_id'], sensor_record)
+        merged = merge_delta(data, get_delta_base(data['device_id']))
+        if merged is None:
+            return jsonify({'error': 'No matching base reading for this device, send a full reading'}), 409
+
+        return queue_sensor_reading(merged)
+    except Exception as e:
+        logger.error(f"Sensor delta error: {str(e)}")
+        return jsonify({'error': 'Failed to process sensor data'}), 500
+
+@app.route('/api/sensor-data/batch', methods=['POST'])
+def receive_sensor_batch():
+    """Receive readings from many IoT devices in one request; entries flagged 'delta' carry only changed fields"""
+    try:
+        data = request.get_json()
+        if not isinstance(data, list):
+            return jsonify({'error': 'A list of readings is required'}), 400
+
+        # Each entry gets its own status, in request order
+        results = [None] * len(data)
+
+        # Validate required fields
+        required_fields = ['device_id', 'user_id']
+        entries = []
+        for i, entry in enumerate(data):
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError('Each reading must be an object')
+                for field in required_fields:
+                    if field not in entry:
+                        raise ValueError(f'{field} is required')
+                validate_sensor_ids(entry)
+                validate_sensor_seq(entry)
+            except ValueError as e:
+                results[i] = {'status': 400, 'error': str(e)}
+                continue
+            entries.append((i, entry))
+
+        # Stored bases of every device sending a delta, fetched in one round trip
+        stored_bases = get_delta_bases({entry['device_id'] for _, entry in entries if entry.get('delta')})
+
+        known_users = {}
+        readings = []
+        batch_bases = {} # A device's earlier entry in this request is the base for its later deltas
+        for i, entry in entries:
+            if entry['user_id'] not in known_users:
+                known_users[entry['user_id']] = get_user_cached(entry['user_id']) is not None
+            if not known_users[entry['user_id']]:
+                results[i] = {'status': 404, 'error': 'Unknown user_id'}
+                continue
+            if entry.get('delta'):
+                base = batch_bases.get(entry['device_id'])
+                if base is None:
+                    base = stored_bases[entry['device_id']]
+                merged = merge_delta(entry, base)
+                if merged is None:
+                    results[i] = {'status': 409, 'error': 'No matching base reading for this device, send a full reading'}
+                    continue
+                entry = merged
+            # Rejected here, a bad value costs one reading; in the writer it would cost the whole insert batch
+            try:
+                values = parse_sensor_values(entry)
+            except ValueError as e:
+                results[i] = {'status': 400, 'error': str(e)}
+                continue
+            batch_bases[entry['device_id']] = {**values, 'seq': entry.get('seq')}
+            readings.append((i, entry, values))
+
+        ratios, predicted = calculate_compression_ratios([entry['device_id'] for _, entry, _ in readings],
+                                                         [values for _, _, values in readings])
+        for (i, entry, values), compression_ratio, is_predicted in zip(readings, ratios.tolist(), predicted.tolist()):
+            store_sensor_reading(entry, values, compression_ratio, is_predicted)
+            results[i] = {'status': 202, 'compression_ratio': compression_ratio, 'is_predicted': is_predicted}
+        # Each device's last accepted entry becomes its base, written in one round trip
+        set_delta_bases(batch_bases)
 
         return jsonify({
-            'message': 'Data received successfully',
-            'compression_ratio': float(compression_ratio),
-            'is_predicted': is_predicted,
-            'weather_included': weather_data is not None
-        }), 200
+            'message': f'{len(readings)} of {len(data)} readings received',
+            'results': results
+        }), 202
     except Exception as e:
-        logger.error(f"Sensor data error: {str(e)}")
+        logger.error(f"Sensor batch error: {str(e)}")
         return jsonify({'error': 'Failed to process sensor data'}), 500
 
+def store_sensor_reading(data, reading, compression_ratio, is_predicted):
+    """Queue a device's reading (parsed SENSOR_FIELDS) for the batch writer"""
+    # Queue sensor data record for the batch writer
+    sensor_batcher.put({
+        'user_id': data['user_id'],
+        'device_id': data['device_id'],
+        **reading,
+        'compression_ratio': compression_ratio,
+        'is_predicted': is_predicted,
+        'timestamp': datetime.utcnow()
+    })
+
+def queue_sensor_reading(data):
+    """Queue one complete device reading for the batch writer and build the API response"""
+    # Bad values and unknown users would fail the whole insert batch; reject them while the device can be told
+    try:
+        validate_sensor_ids(data)
+        validate_sensor_seq(data)
+        reading = parse_sensor_values(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if get_user_cached(data['user_id']) is None:
+        return jsonify({'error': 'Unknown user_id'}), 404
+
+    # Calculate compression ratio
+    compression_ratio, is_predicted = calculate_compression_ratio(data['device_id'], reading)
+    store_sensor_reading(data, reading, compression_ratio, is_predicted)
+    set_delta_base(data['device_id'], {**reading, 'seq': data.get('seq')})
+
+    return jsonify({
+        'message': 'Data received successfully',
+        'compression_ratio': float(compression_ratio),
+        'is_predicted': is_predicted,
+        # Weather is attached by a background task once the reading is stored
+        'weather_included': data.get('latitude') is not None and data.get('longitude') is not None
+    }), 202
+
 @app.route('/api/orders', methods=['POST'])
 def create_order():
     """Create a new hardware order"""
     try:
         data = request.get_json()
 
-        # Generate order number
-        order_number = f"SF{datetime.now().strftime('%Y%m%d')}{Order.query.count() + 1:04d}"
-
-        # Create order
-        order = Order(
-            user_id=data.get('user_id'),
-            order_number=order_number,
-            customer_name=data['customer_name'],
-            customer_phone=data['customer_phone'],
-            customer_email=data['customer_email'],
-            order_type=data['order_type'],
-            items=data['items'],
-            total_amount=data['total_amount'],
-            shipping_address=data['shipping_address'],
-            notes=data.get('notes', '')
-        )
-        db.session.add(order)
-        db.session.commit()
+        # Generate order number (random suffix, no COUNT(*) over the orders table);
+        # a suffix that clashes with an existing order is drawn again
+        for attempt in range(ORDER_NUMBER_ATTEMPTS):
+            order_number = new_order_number()
+
+            # Create order
+            order = Order(
+                user_id=data.get('user_id'),
+                order_number=order_number,
+                customer_name=data['customer_name'],
+                customer_phone=data['customer_phone'],
+                customer_email=data['customer_email'],
+                order_type=data['order_type'],
+                items=data['items'],
+                total_amount=data['total_amount'],
+                shipping_address=data['shipping_address'],
+                notes=data.get('notes', '')
+            )
+            db.session.add(order)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                taken = db.session.execute(db.select(Order.id).where(Order.order_number == order_number)).first()
+                if taken is None or attempt == ORDER_NUMBER_ATTEMPTS - 1:
+                    raise
 
         # Send notifications
-        notify_order_received(order)
+        enqueue_task(notify_order_received, order.id)
 
         logger.info(f"New order created: {order_number} from {data['customer_phone']}")
         return jsonify({
@@ -593,21 +1239,43 @@ def get_dashboard_data(user_id):
         # if current_user_id != user_id:
         #     return jsonify({'error': 'Unauthorized'}), 403
 
-        user = User.query.get(user_id)
+        # Only the columns the dashboard renders are selected
+        user = db.session.execute(
+            db.select(User.name, User.phone, User.farm_type, User.location).where(User.id == user_id)
+        ).first()
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
+        iso = datetime.isoformat # bound once for the per-row timestamp formatting below
+
         # Get latest sensor data
-        latest_data = db.session.query(SensorData).filter_by(user_id=user_id).order_by(SensorData.timestamp.desc()).limit(10).all()
+        latest_data = db.session.execute(
+            db.select(SensorData.device_id, SensorData.temperature, SensorData.humidity, SensorData.soil_moisture,
+                      SensorData.light_intensity, SensorData.compression_ratio, SensorData.timestamp)
+            .where(SensorData.user_id == user_id)
+            .order_by(SensorData.timestamp.desc()).limit(10)
+        ).all()
 
         # Get device status
-        devices = Device.query.filter_by(user_id=user_id).all()
+        devices = db.session.execute(
+            db.select(Device.device_id, Device.device_name, Device.is_active, Device.last_seen, Device.location_name)
+            .where(Device.user_id == user_id)
+        ).all()
 
         # Get unread alerts
-        alerts = Alert.query.filter_by(user_id=user_id, is_read=False).order_by(Alert.created_at.desc()).limit(5).all()
-
-        # Calculate compression statistics
-        avg_compression = db.session.query(db.func.avg(SensorData.compression_ratio)).filter_by(user_id=user_id).scalar() or 0
+        alerts = db.session.execute(
+            db.select(Alert.title, Alert.message, Alert.severity, Alert.created_at)
+            .where(Alert.user_id == user_id, Alert.is_read.is_(False))
+            .order_by(Alert.created_at.desc()).limit(5)
+        ).all()
+
+        # Compression and unread-alert statistics in one round trip
+        avg_compression, unread_alerts = db.session.execute(db.select(
+            db.select(db.func.avg(SensorData.compression_ratio))
+            .where(SensorData.user_id == user_id).scalar_subquery(),
+            db.select(db.func.count(Alert.id))
+            .where(Alert.user_id == user_id, Alert.is_read.is_(False)).scalar_subquery()
+        )).one()
 
         return jsonify({
             'user': {
@@ -623,26 +1291,26 @@ def get_dashboard_data(user_id):
                 'soil_moisture': float(data.soil_moisture) if data.soil_moisture else None,
                 'light_intensity': float(data.light_intensity) if data.light_intensity else None,
                 'compression_ratio': float(data.compression_ratio) if data.compression_ratio else None,
-                'timestamp': data.timestamp.isoformat()
+                'timestamp': iso(data.timestamp)
             } for data in latest_data],
             'devices': [{
                 'device_id': device.device_id,
                 'device_name': device.device_name,
                 'is_active': device.is_active,
-                'last_seen': device.last_seen.isoformat(),
+                'last_seen': iso(device.last_seen),
                 'location_name': device.location_name
             } for device in devices],
             'alerts': [{
                 'title': alert.title,
                 'message': alert.message,
                 'severity': alert.severity,
-                'created_at': alert.created_at.isoformat()
+                'created_at': iso(alert.created_at)
             } for alert in alerts],
             'statistics': {
-                'avg_compression_ratio': float(avg_compression),
+                'avg_compression_ratio': float(avg_compression or 0),
                 'total_devices': len(devices),
-                'active_devices': len([d for d in devices if d.is_active]),
-                'unread_alerts': len(alerts)
+                'active_devices': sum(1 for d in devices if d.is_active),
+                'unread_alerts': unread_alerts
             },
             'support_contact': SUPPORT_PHONE
         }), 200
@@ -661,12 +1329,12 @@ def contact_support():
 
         # Send notification to support team
         support_message = f"Smart Farm contact form: {data.get('name')} ({data.get('phone')}) - {data.get('message')[:100]}..."
-        send_sms_notification(SUPPORT_PHONE, support_message)
+        enqueue_task(send_sms_notification, SUPPORT_PHONE, support_message)
 
         # Send confirmation to customer
         if data.get('phone'):
             customer_message = f"Hi {data.get('name')}! We received your message. Our team will call you at {data.get('phone')} within 2 hours. For urgent help, call {SUPPORT_PHONE}. - Smart Farm Team"
-            send_sms_notification(data.get('phone'), customer_message)
+            enqueue_task(send_sms_notification, data.get('phone'), customer_message)
 
         return jsonify({
             'message': 'Message sent successfully',
@@ -684,11 +1352,11 @@ def request_quote():
 
         # Send quote request to sales team
         quote_message = f"Quote request from {data.get('name')} ({data.get('phone')}): {data.get('farm_type')} farm, {data.get('farm_size')} hectares. Requirements: {data.get('requirements', 'Not specified')[:100]}..."
-        send_sms_notification(SUPPORT_PHONE, quote_message)
+        enqueue_task(send_sms_notification, SUPPORT_PHONE, quote_message)
 
         # Send confirmation to customer
         customer_message = f"Hi {data.get('name')}! We'll prepare a custom quote for your {data.get('farm_type')} farm and call you at {data.get('phone')} today. For immediate help, call {SUPPORT_PHONE}. - Smart Farm Team"
-        send_sms_notification(data.get('phone'), customer_message)
+        enqueue_task(send_sms_notification, data.get('phone'), customer_message)
 
         return jsonify({
             'message': 'Quote request submitted successfully',
@@ -725,16 +1393,15 @@ def create_db_command():
     """Creates the database tables."""
     with app.app_context():
         db.create_all()
-    print("Database tables created successfully!")
     logger.info("Database tables created successfully")
 
 # --- Main ---
 if __name__ == '__main__':
     # Development server
-    print(f"🌱 Smart Farm Nigeria API Server")
-    print(f"📞 Support: {SUPPORT_PHONE}")
-    print(f"📧 Email: {SUPPORT_EMAIL}")
-    print(f"🚀 Starting server...")
+    logger.info("🌱 Smart Farm Nigeria API Server")
+    logger.info("📞 Support: %s", SUPPORT_PHONE)
+    logger.info("📧 Email: %s", SUPPORT_EMAIL)
+    logger.info("🚀 Starting server...")
     app.run(
         host='0.0.0.0',
         port=int(os.environ.get('PORT', 5000)),
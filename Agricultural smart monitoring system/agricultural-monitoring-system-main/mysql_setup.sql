@@ -112,7 +112,7 @@ CREATE TABLE alerts (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     resolved_at TIMESTAMP NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    INDEX idx_user_unread (user_id, is_read),
+    INDEX idx_user_unread_created (user_id, is_read, created_at),
     INDEX idx_created_at (created_at)
 );
 
@@ -63,6 +63,8 @@ CREATE TABLE devices (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX idx_devices_user_active ON devices (user_id, is_active);
+
 -- Orders table for hardware purchases
 CREATE TABLE orders (
     id SERIAL PRIMARY KEY,
@@ -105,7 +107,7 @@ CREATE TABLE alerts (
     resolved_at TIMESTAMP WITH TIME ZONE NULL
 );
 
-CREATE INDEX idx_user_unread ON alerts (user_id, is_read);
+CREATE INDEX idx_user_unread_created ON alerts (user_id, is_read, created_at);
 CREATE INDEX idx_created_at ON alerts (created_at);
 
 -- System settings and configurations
@@ -160,4 +162,12 @@ CREATE TABLE compression_stats (
     energy_saved_percent DECIMAL(5,2),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     UNIQUE (user_id, device_id, date)
-);
\ No newline at end of file
+);
+
+-- Existing databases: add the lookup indexes without blocking sensor inserts
+-- (run outside a transaction block)
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_timestamp ON sensor_data (user_id, timestamp);
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_device_timestamp ON sensor_data (device_id, timestamp);
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_devices_user_active ON devices (user_id, is_active);
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_unread_created ON alerts (user_id, is_read, created_at);
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_user_unread;
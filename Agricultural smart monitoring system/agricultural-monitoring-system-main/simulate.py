@@ -8,20 +8,32 @@ Email: orders@smartfarm.ng
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import asyncio
+import gzip
+import orjson
 import time
 import random
-import math
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime
 import argparse
 import sys
 import logging
 from typing import Dict, List, Optional
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; without it the kernel below runs as plain NumPy
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
 )
 logger = logging.getLogger(__name__)
 
@@ -29,14 +41,89 @@ logger = logging.getLogger(__name__)
 API_BASE_URL = "http://localhost:5000"  # Change to your server URL
 SUPPORT_PHONE = "+2348169849839"
 
+# Smallest change per field worth uploading; smaller moves are left out of delta payloads
+DELTA_TOLERANCES = {
+    "temperature": 0.1,
+    "humidity": 0.5,
+    "soil_moisture": 0.2,
+    "light_intensity": 5.0,
+    "ph_level": 0.02,
+    "nitrogen_level": 1.0,
+    "phosphorus_level": 1.0,
+    "potassium_level": 1.0,
+    "battery_level": 0.5,
+    "signal_strength": 2,
+    "latitude": 1e-6,
+    "longitude": 1e-6
+}
+FULL_READING_EVERY = 10  # Deltas sent before a device resends its full reading
+
+@njit(cache=True, fastmath=True)
+def step_kernel(moisture, ph, battery, signal_base, temp_base, temp_var, hum_base, hum_lo, hum_hi,
+                moist_lo, moist_hi, light_max, ph_lo, ph_hi, day_factor, daytime, noise):
+    """Advance every device by one reading; noise holds 10 rows of uniform [0, 1) draws per device"""
+    # Temperature follows a sine wave with peak at 14:00
+    temperature = temp_base + day_factor * temp_var + (noise[0] * 4 - 2)
+    
+    # Humidity inversely related to temperature
+    humidity = np.clip(hum_base - (temperature - temp_base) * 1.5 + (noise[1] * 10 - 5), hum_lo, hum_hi)
+    
+    # Soil moisture varies slowly, with a slight tendency to dry out
+    moisture = np.clip(moisture + (noise[2] * 3 - 2), moist_lo, moist_hi)
+    
+    # Light intensity based on time of day
+    if daytime:
+        light_intensity = light_max * day_factor * (0.8 + noise[3] * 0.4)
+    else:
+        light_intensity = noise[3] * 50  # Night time
+    
+    # pH changes slowly
+    ph = np.clip(ph + (noise[4] * 0.2 - 0.1), ph_lo, ph_hi)
+    
+    # Battery level decreases slowly (0-0.5% per reading)
+    battery = np.maximum(10.0, battery - noise[5] * 0.5)
+    
+    # Signal strength varies by -10..10
+    signal_strength = np.clip(signal_base + (noise[6] * 21).astype(np.int64) - 10, -100, -20)
+    
+    # Nitrogen, Phosphorus, Potassium levels (NPK), mg/kg
+    nitrogen = 20 + noise[7] * 180
+    phosphorus = 10 + noise[8] * 90
+    potassium = 50 + noise[9] * 250
+    
+    return (temperature, humidity, moisture, light_intensity, ph, battery, signal_strength,
+            nitrogen, phosphorus, potassium)
+
 class SmartFarmSimulator:
     """Simulates IoT sensors for Smart Farm system"""
     
-    def __init__(self, api_url: str = API_BASE_URL):
+    def __init__(self, api_url: str = API_BASE_URL, seed: Optional[int] = None, compress: bool = False):
         self.api_url = api_url
+        self.compress = compress  # gzip sensor uploads for slow (cellular) links
         self.devices = []
         self.weather_cache = {}
         self.simulation_start_time = datetime.now()
+        self._session: Optional[aiohttp.ClientSession] = None  # Opened by run_simulation
+        # Private generators (no shared module-level state); a seed makes runs reproducible
+        self._rng = random.Random(seed)
+        self._np_rng = np.random.default_rng(seed)
+        
+        # Daylight factor per hour of day: sine from 06:00 to 18:00, -0.3 at night
+        hours = np.arange(24)
+        self._day_cycle = np.where((hours >= 6) & (hours <= 18), np.sin((hours - 6) * np.pi / 12), -0.3)
+        
+        # Delta encoding state: what the server last accepted per device, and each device's reading counter
+        self._last_sent = {}
+        self._deltas_sent = {}
+        self._seq = {}
+        
+        # Keep-alive session for the synchronous setup calls (health, user, orders)
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                              max_retries=Retry(total=2, backoff_factor=0.2))
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self.http.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
         
         # Nigerian locations for testing
         self.locations = [
@@ -80,8 +167,8 @@ class SmartFarmSimulator:
         devices = []
         
         for i in range(num_devices):
-            location = random.choice(self.locations)
-            farm_type = random.choice(list(self.farm_types.keys()))
+            location = self._rng.choice(self.locations)
+            farm_type = self._rng.choice(list(self.farm_types.keys()))
             
             device = {
                 "device_id": f"ESP32_SIM_{i+1:03d}",
@@ -89,166 +176,234 @@ class SmartFarmSimulator:
                 "device_name": f"Smart Farm Sensor {i+1}",
                 "farm_type": farm_type,
                 "location": location,
-                "latitude": location["lat"] + random.uniform(-0.01, 0.01),
-                "longitude": location["lng"] + random.uniform(-0.01, 0.01),
-                "firmware_version": "2.1.3",
-                "battery_level": random.uniform(80, 100),
-                "signal_strength": random.randint(-70, -30),
-                "last_values": {}  # Store previous values for realistic changes
+                "latitude": location["lat"] + self._rng.uniform(-0.01, 0.01),
+                "longitude": location["lng"] + self._rng.uniform(-0.01, 0.01),
+                "firmware_version": "2.1.3"
             }
             devices.append(device)
             
         self.devices = devices
+        self._build_device_arrays()
         logger.info(f"Created {len(devices)} test devices")
         return devices
     
-    def simulate_realistic_sensor_data(self, device: Dict) -> Dict:
-        """Generate realistic sensor data based on time, location, and farm type"""
-        current_time = datetime.now()
-        hour = current_time.hour
-        
-        # Get farm characteristics
-        farm_chars = self.farm_types[device["farm_type"]]
-        
-        # Simulate daily temperature cycle
-        base_temp = (farm_chars["temp_range"][0] + farm_chars["temp_range"][1]) / 2
-        temp_variation = (farm_chars["temp_range"][1] - farm_chars["temp_range"][0]) / 4
-        
-        # Temperature follows a sine wave with peak at 14:00
-        temp_cycle = math.sin((hour - 6) * math.pi / 12) if 6 <= hour <= 18 else -0.3
-        temperature = base_temp + (temp_cycle * temp_variation) + random.uniform(-2, 2)
-        
-        # Humidity inversely related to temperature
-        base_humidity = (farm_chars["humidity_range"][0] + farm_chars["humidity_range"][1]) / 2
-        humidity = base_humidity - (temperature - base_temp) * 1.5 + random.uniform(-5, 5)
-        humidity = max(farm_chars["humidity_range"][0], min(farm_chars["humidity_range"][1], humidity))
-        
-        # Soil moisture varies slowly
-        if "soil_moisture" in device["last_values"]:
-            moisture_change = random.uniform(-2, 1)  # Slight tendency to dry out
-            soil_moisture = device["last_values"]["soil_moisture"] + moisture_change
-        else:
-            soil_moisture = random.uniform(*farm_chars["moisture_range"])
+    def _build_device_arrays(self):
+        """Lay farm characteristics and sensor state out as one NumPy array per field, indexed like self.devices"""
+        n = len(self.devices)
+        chars = [self.farm_types[device["farm_type"]] for device in self.devices]
         
-        soil_moisture = max(farm_chars["moisture_range"][0], min(farm_chars["moisture_range"][1], soil_moisture))
+        def bounds(key):
+            lo_hi = np.array([c[key] for c in chars], dtype=float).reshape(n, 2)
+            return lo_hi[:, 0], lo_hi[:, 1]
         
-        # Light intensity based on time of day
-        if 6 <= hour <= 18:
-            base_light = farm_chars["light_range"][1]
-            light_cycle = math.sin((hour - 6) * math.pi / 12)
-            light_intensity = base_light * light_cycle * random.uniform(0.8, 1.2)
-        else:
-            light_intensity = random.uniform(0, 50)  # Night time
+        temp_lo, temp_hi = bounds("temp_range")
+        self._temp_base = (temp_lo + temp_hi) / 2
+        self._temp_var = (temp_hi - temp_lo) / 4
+        self._hum_lo, self._hum_hi = bounds("humidity_range")
+        self._hum_base = (self._hum_lo + self._hum_hi) / 2
+        self._moist_lo, self._moist_hi = bounds("moisture_range")
+        self._light_max = bounds("light_range")[1]
+        self._ph_lo, self._ph_hi = bounds("ph_range")
         
-        # pH changes slowly
-        if "ph_level" in device["last_values"]:
-            ph_change = random.uniform(-0.1, 0.1)
-            ph_level = device["last_values"]["ph_level"] + ph_change
-        else:
-            ph_level = random.uniform(*farm_chars["ph_range"])
-        
-        ph_level = max(farm_chars["ph_range"][0], min(farm_chars["ph_range"][1], ph_level))
-        
-        # Battery level decreases slowly
-        if "battery_level" in device["last_values"]:
-            battery_decrease = random.uniform(0, 0.5)  # 0-0.5% per reading
-            device["battery_level"] = max(10, device["battery_level"] - battery_decrease)
-        
-        # Signal strength varies
-        base_signal = device["signal_strength"]
-        signal_strength = base_signal + random.randint(-10, 10)
-        signal_strength = max(-100, min(-20, signal_strength))
-        
-        # Nitrogen, Phosphorus, Potassium levels (NPK)
-        nitrogen = random.uniform(20, 200)  # mg/kg
-        phosphorus = random.uniform(10, 100)  # mg/kg
-        potassium = random.uniform(50, 300)  # mg/kg
-        
-        sensor_data = {
-            "device_id": device["device_id"],
-            "user_id": device["user_id"],
-            "temperature": round(temperature, 1),
-            "humidity": round(humidity, 1),
-            "soil_moisture": round(soil_moisture, 1),
-            "light_intensity": round(light_intensity, 1),
-            "ph_level": round(ph_level, 2),
-            "nitrogen_level": round(nitrogen, 1),
-            "phosphorus_level": round(phosphorus, 1),
-            "potassium_level": round(potassium, 1),
-            "battery_level": round(device["battery_level"], 1),
-            "signal_strength": signal_strength,
-            "latitude": device["latitude"],
-            "longitude": device["longitude"],
-            "timestamp": current_time.isoformat()
+        # In step_kernel argument order, so a subset of devices can be stepped with [a[idx] for a in ...]
+        self._characteristics = (self._temp_base, self._temp_var, self._hum_base, self._hum_lo, self._hum_hi,
+                                 self._moist_lo, self._moist_hi, self._light_max, self._ph_lo, self._ph_hi)
+        
+        # Fields that never change between readings, as ready-made payload columns
+        self._static_columns = {
+            "device_id": [device["device_id"] for device in self.devices],
+            "user_id": [device["user_id"] for device in self.devices],
+            "latitude": [device["latitude"] for device in self.devices],
+            "longitude": [device["longitude"] for device in self.devices]
+        }
+        
+        # State carried from one reading to the next
+        rng = self._np_rng
+        self._moisture = rng.uniform(self._moist_lo, self._moist_hi)
+        self._ph = rng.uniform(self._ph_lo, self._ph_hi)
+        self._battery = rng.uniform(80, 100, n)
+        self._signal_base = rng.integers(-70, -29, n)
+    
+    def simulate_realistic_sensor_data(self, hour: int, timestamp: str,
+                                       active: Optional[np.ndarray] = None) -> List[Dict]:
+        """Generate one realistic reading per device (only where `active` is set) based on time, location, and farm type"""
+        # Devices without a reading this iteration keep their state; skip them in the physics entirely
+        idx = slice(None) if active is None or active.all() else np.flatnonzero(active)
+        
+        (temperature, humidity, moisture, light_intensity, ph, battery, signal_strength,
+         nitrogen, phosphorus, potassium) = step_kernel(
+            self._moisture[idx], self._ph[idx], self._battery[idx], self._signal_base[idx],
+            *[characteristic[idx] for characteristic in self._characteristics],
+            float(self._day_cycle[hour]), 6 <= hour <= 18,
+            self._np_rng.random((10, len(self._moisture[idx])))  # Every random term of this reading in one draw
+        )
+        self._moisture[idx] = moisture
+        self._ph[idx] = ph
+        self._battery[idx] = battery
+        
+        measured = {
+            "temperature": np.round(temperature, 1),
+            "humidity": np.round(humidity, 1),
+            "soil_moisture": np.round(moisture, 1),
+            "light_intensity": np.round(light_intensity, 1),
+            "ph_level": np.round(ph, 2),
+            "nitrogen_level": np.round(nitrogen, 1),
+            "phosphorus_level": np.round(phosphorus, 1),
+            "potassium_level": np.round(potassium, 1),
+            "battery_level": np.round(battery, 1),
+            "signal_strength": signal_strength
         }
         
-        # Store current values for next iteration
-        device["last_values"] = {
-            "temperature": temperature,
-            "humidity": humidity,
-            "soil_moisture": soil_moisture,
-            "light_intensity": light_intensity,
-            "ph_level": ph_level,
-            "battery_level": device["battery_level"]
+        # Only now fan the columns out into per-device JSON dicts (tolist gives plain Python numbers)
+        static = self._static_columns if isinstance(idx, slice) else {
+            key: [column[i] for i in idx.tolist()] for key, column in self._static_columns.items()
         }
+        columns = {**static, **{key: column.tolist() for key, column in measured.items()}}
+        keys = list(columns)
+        return [dict(zip(keys, values), timestamp=timestamp) for values in zip(*columns.values())]
+    
+    def encode_reading(self, sensor_data: Dict):
+        """Return (is_delta, body) for a reading: the full reading, or only the fields that moved"""
+        device_id = sensor_data["device_id"]
+        last = self._last_sent.get(device_id)
+        # Numbered so a delta can name its base; the server answers 409 when it holds a different one
+        sensor_data["seq"] = self._seq[device_id] = self._seq.get(device_id, 0) + 1
+        
+        # Error readings, first readings and every FULL_READING_EVERY-th reading go out in full
+        if last is None or "error" in sensor_data or self._deltas_sent[device_id] >= FULL_READING_EVERY:
+            return False, sensor_data
         
-        return sensor_data
+        delta = {key: value for key, value in sensor_data.items()
+                 if key not in DELTA_TOLERANCES or abs(value - last[key]) > DELTA_TOLERANCES[key]}
+        delta["base_seq"] = last["seq"]
+        return True, delta
+    
+    def record_sent(self, sensor_data: Dict, is_delta: bool, body: Dict, accepted: bool):
+        """Track what the server now holds for the device so the next delta is computed against it"""
+        device_id = sensor_data["device_id"]
+        if not accepted or "error" in sensor_data:
+            # Server state unknown or unusable; the next reading goes out in full
+            self._last_sent.pop(device_id, None)
+        elif not is_delta:
+            # Readings are built fresh every iteration, so the dict can be kept as is
+            self._last_sent[device_id] = sensor_data
+            self._deltas_sent[device_id] = 0
+        else:
+            self._last_sent[device_id].update(body)
+            del self._last_sent[device_id]["base_seq"]
+            self._deltas_sent[device_id] += 1
+    
+    def log_sent(self, sensor_data: Dict, compression_ratio: float, is_predicted: bool):
+        """Log one reading the server accepted (callers check logger.isEnabledFor(logging.INFO) first)"""
+        logger.info("✅ Data sent from %s: Temp=%s°C, Moisture=%s%%, Compression=%s%% %s",
+                    sensor_data["device_id"], sensor_data["temperature"], sensor_data["soil_moisture"],
+                    compression_ratio, "(Predicted)" if is_predicted else "(Transmitted)")
     
-    def send_sensor_data(self, sensor_data: Dict) -> bool:
+    def encode_body(self, payload):
+        """Serialize a sensor upload to (body, headers), gzip-compressed when enabled"""
+        body = orjson.dumps(payload)
+        if self.compress:
+            return gzip.compress(body, compresslevel=1), {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        return body, {"Content-Type": "application/json"}
+    
+    async def send_sensor_data(self, sensor_data: Dict) -> bool:
         """Send sensor data to the API"""
+        is_delta, body = self.encode_reading(sensor_data)
+        accepted = False
         try:
-            url = f"{self.api_url}/api/sensor-data"
-            headers = {"Content-Type": "application/json"}
-            
-            response = requests.post(url, json=sensor_data, headers=headers, timeout=10)
+            url = f"{self.api_url}/api/sensor-data/delta" if is_delta else f"{self.api_url}/api/sensor-data"
+            data, headers = self.encode_body(body)
             
-            if response.status_code == 200:
-                result = response.json()
-                compression_ratio = result.get("compression_ratio", 0)
-                is_predicted = result.get("is_predicted", False)
-                
-                logger.info(f"✅ Data sent from {sensor_data['device_id']}: "
-                          f"Temp={sensor_data['temperature']}°C, "
-                          f"Moisture={sensor_data['soil_moisture']}%, "
-                          f"Compression={compression_ratio}% "
-                          f"{'(Predicted)' if is_predicted else '(Transmitted)'}")
-                return True
-            else:
-                logger.error(f"❌ Failed to send data: {response.status_code} - {response.text}")
-                return False
+            async with self._session.post(url, data=data, headers=headers,
+                                          timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status in (200, 202):
+                    accepted = True
+                    content = await response.read()  # Drained so the connection returns to the pool
+                    
+                    # The reply only feeds the log line below; skip decoding it when INFO is off (--quiet)
+                    if logger.isEnabledFor(logging.INFO):
+                        result = orjson.loads(content)
+                        self.log_sent(sensor_data, result.get("compression_ratio", 0), result.get("is_predicted", False))
+                    return True
+                else:
+                    logger.error("❌ Failed to send data: %s - %s", response.status, await response.text())
+                    return False
                 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Network error sending sensor data: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("❌ Network error sending sensor data: %s", e)
             return False
         except Exception as e:
-            logger.error(f"❌ Error sending sensor data: {str(e)}")
+            logger.error("❌ Error sending sensor data: %s", e)
             return False
+        finally:
+            self.record_sent(sensor_data, is_delta, body, accepted)
     
-    def simulate_device_issues(self, device: Dict) -> Optional[Dict]:
-        """Simulate occasional device issues"""
-        # 5% chance of device issues
-        if random.random() < 0.05:
-            issue_type = random.choice(["offline", "low_battery", "sensor_error"])
+    async def send_sensor_batch(self, readings: List[Dict]) -> int:
+        """Send many device readings in one request; returns how many the server accepted"""
+        if not readings:
+            return 0
+        
+        encoded = [self.encode_reading(sensor_data) for sensor_data in readings]
+        entries = [{**body, "delta": True} if is_delta else body for is_delta, body in encoded]
+        results = [{}] * len(readings)
+        try:
+            url = f"{self.api_url}/api/sensor-data/batch"
+            data, headers = self.encode_body(entries)
             
-            if issue_type == "offline":
-                logger.warning(f"⚠️ Device {device['device_id']} went offline")
-                return None
-            elif issue_type == "low_battery":
-                device["battery_level"] = random.uniform(5, 15)
-                logger.warning(f"🔋 Device {device['device_id']} low battery: {device['battery_level']}%")
-            elif issue_type == "sensor_error":
-                # Return invalid data to test error handling
-                logger.warning(f"⚠️ Device {device['device_id']} sensor error")
-                return {
+            async with self._session.post(url, data=data, headers=headers,
+                                          timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status in (200, 202):
+                    results = orjson.loads(await response.read())["results"]
+                else:
+                    logger.error("❌ Failed to send batch: %s - %s", response.status, await response.text())
+                
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("❌ Network error sending sensor batch: %s", e)
+        except Exception as e:
+            logger.error("❌ Error sending sensor batch: %s", e)
+        
+        accepted = 0
+        for sensor_data, (is_delta, body), result in zip(readings, encoded, results):
+            ok = result.get("status") == 202
+            self.record_sent(sensor_data, is_delta, body, ok)
+            if ok:
+                accepted += 1
+                if logger.isEnabledFor(logging.INFO):
+                    self.log_sent(sensor_data, result["compression_ratio"], result["is_predicted"])
+            elif result:
+                logger.error("❌ Failed to send data from %s: %s - %s",
+                             sensor_data["device_id"], result.get("status"), result.get("error"))
+        return accepted
+    
+    def simulate_device_issues(self):
+        """Roll this iteration's device issues for all devices at once; returns (healthy mask, error payloads)"""
+        # 5% chance of device issues, split evenly: 0 = offline, 1 = low battery, 2 = sensor error, 3+ = none
+        issues = (self._np_rng.random(len(self.devices)) * (3 / 0.05)).astype(np.int64)
+        
+        low_battery = np.flatnonzero(issues == 1)
+        self._battery[low_battery] = self._np_rng.uniform(5, 15, len(low_battery))
+        
+        error_payloads = []
+        for index in np.flatnonzero(issues < 3).tolist():
+            device = self.devices[index]
+            if issues[index] == 0:
+                logger.warning("⚠️ Device %s went offline", device["device_id"])
+            elif issues[index] == 1:
+                logger.warning("🔋 Device %s low battery: %s%%", device["device_id"], self._battery[index])
+            else:
+                # Send invalid data to test error handling
+                logger.warning("⚠️ Device %s sensor error", device["device_id"])
+                error_payloads.append({
                     "device_id": device["device_id"],
                     "user_id": device["user_id"],
                     "temperature": None,
                     "humidity": None,
                     "soil_moisture": None,
                     "error": "Sensor malfunction detected"
-                }
+                })
         
-        return self.simulate_realistic_sensor_data(device)
+        # Offline devices send nothing and faulty ones send the error payload; neither needs a simulated reading
+        return (issues == 1) | (issues >= 3), error_payloads
     
     def create_test_user(self) -> bool:
         """Create a test user for simulation"""
@@ -264,7 +419,7 @@ class SmartFarmSimulator:
             }
             
             url = f"{self.api_url}/api/register"
-            response = requests.post(url, json=user_data, timeout=10)
+            response = self.http.post(url, data=orjson.dumps(user_data), timeout=10)
             
             if response.status_code == 201:
                 logger.info("✅ Test user created successfully")
@@ -300,7 +455,7 @@ class SmartFarmSimulator:
             }
             
             url = f"{self.api_url}/api/orders"
-            response = requests.post(url, json=order_data, timeout=10)
+            response = self.http.post(url, data=orjson.dumps(order_data), timeout=10)
             
             if response.status_code == 201:
                 result = response.json()
@@ -315,8 +470,8 @@ class SmartFarmSimulator:
             logger.error(f"❌ Error testing order system: {str(e)}")
             return False
     
-    def run_simulation(self, duration_minutes: int = 60, interval_seconds: int = 30, 
-                      test_orders: bool = False, create_user: bool = True):
+    async def run_simulation(self, duration_minutes: int = 60, interval_seconds: int = 30, 
+                            test_orders: bool = False, create_user: bool = True):
         """Run the complete simulation"""
         logger.info(f"🌱 Starting Smart Farm IoT Simulation")
         logger.info(f"📞 Support Contact: {SUPPORT_PHONE}")
@@ -326,7 +481,7 @@ class SmartFarmSimulator:
         
         # Test API connectivity
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=10)
+            response = self.http.get(f"{self.api_url}/health", timeout=10)
             if response.status_code == 200:
                 logger.info("✅ API server is responsive")
             else:
@@ -347,8 +502,9 @@ class SmartFarmSimulator:
             logger.info("🛒 Testing order system...")
             self.test_order_system()
         
-        # Create test devices
-        self.create_test_devices()
+        # Devices normally come from main (--devices); only fall back to the default set
+        if not self.devices:
+            self.create_test_devices()
         
         # Display device information
         logger.info("📱 Created test devices:")
@@ -357,50 +513,58 @@ class SmartFarmSimulator:
                        f"({device['farm_type']} farm at {device['location']['name']})")
         
         # Run simulation loop
-        end_time = datetime.now() + timedelta(minutes=duration_minutes)
+        deadline = time.monotonic() + duration_minutes * 60  # Immune to wall-clock (NTP) jumps
         iteration = 0
         successful_transmissions = 0
         total_attempts = 0
         
         logger.info(f"🚀 Starting data simulation...")
         
+        # One pooled keep-alive session shared by every device POST
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, keepalive_timeout=60)
+        )
+        
         try:
-            while datetime.now() < end_time:
+            while time.monotonic() < deadline:
                 iteration += 1
-                logger.info(f"\n📊 Simulation Iteration #{iteration}")
+                logger.info("\n📊 Simulation Iteration #%s", iteration)
                 
-                for device in self.devices:
-                    # Simulate sensor data (with possible issues)
-                    sensor_data = self.simulate_device_issues(device)
-                    
-                    if sensor_data is None:
-                        continue  # Device offline
-                    
-                    # Send data to API
-                    total_attempts += 1
-                    if self.send_sensor_data(sensor_data):
-                        successful_transmissions += 1
+                # All devices in one iteration share the same clock reading
+                iteration_time = datetime.now()
+                healthy, error_payloads = self.simulate_device_issues()
+                readings = self.simulate_realistic_sensor_data(iteration_time.hour, iteration_time.isoformat(), healthy)
                 
-                # Display statistics
-                success_rate = (successful_transmissions / total_attempts * 100) if total_attempts > 0 else 0
-                runtime = datetime.now() - self.simulation_start_time
+                # Good readings travel together in one batch request; error-injection
+                # payloads keep the single-reading path so its error handling is exercised
+                total_attempts += len(readings) + len(error_payloads)
+                results = await asyncio.gather(self.send_sensor_batch(readings),
+                                               *[self.send_sensor_data(p) for p in error_payloads])
+                successful_transmissions += sum(results)
                 
-                logger.info(f"📈 Statistics: {successful_transmissions}/{total_attempts} successful "
-                          f"({success_rate:.1f}% success rate)")
-                logger.info(f"⏱️ Runtime: {runtime}")
+                # Display statistics
+                if logger.isEnabledFor(logging.INFO):
+                    success_rate = (successful_transmissions / total_attempts * 100) if total_attempts > 0 else 0
+                    runtime = datetime.now() - self.simulation_start_time
+                    
+                    logger.info("📈 Statistics: %s/%s successful (%.1f%% success rate)",
+                                successful_transmissions, total_attempts, success_rate)
+                    logger.info("⏱️ Runtime: %s", runtime)
                 
                 # Wait for next iteration
-                if datetime.now() < end_time:
-                    logger.info(f"⏸️ Waiting {interval_seconds} seconds...")
-                    time.sleep(interval_seconds)
+                if time.monotonic() < deadline:
+                    logger.info("⏸️ Waiting %s seconds...", interval_seconds)
+                    await asyncio.sleep(interval_seconds)
         
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             logger.info("\n⏹️ Simulation stopped by user")
         
         except Exception as e:
             logger.error(f"❌ Simulation error: {str(e)}")
         
         finally:
+            await self._session.close()
+            
             # Final statistics
             total_runtime = datetime.now() - self.simulation_start_time
             logger.info(f"\n🏁 Simulation Complete!")
@@ -422,6 +586,8 @@ def main():
     parser.add_argument("--test-orders", action="store_true", help="Test the order system")
     parser.add_argument("--no-user", action="store_true", help="Don't create test user")
     parser.add_argument("--quiet", action="store_true", help="Reduce logging output")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible sensor data")
+    parser.add_argument("--gzip", action="store_true", help="Gzip-compress sensor uploads (slow links)")
     
     args = parser.parse_args()
     
@@ -430,29 +596,32 @@ def main():
         logging.getLogger().setLevel(logging.WARNING)
     
     # Create and run simulator
-    simulator = SmartFarmSimulator(api_url=args.url)
+    simulator = SmartFarmSimulator(api_url=args.url, seed=args.seed, compress=args.gzip)
     
-    # Print banner
-    print("=" * 60)
-    print("🌱 SMART FARM NIGERIA - IoT SENSOR SIMULATION")
-    print("=" * 60)
-    print(f"📞 Support: {SUPPORT_PHONE}")
-    print(f"📧 Email: orders@smartfarm.ng")
-    print(f"🌐 API URL: {args.url}")
-    print(f"⏱️ Duration: {args.duration} minutes")
-    print(f"📱 Devices: {args.devices}")
-    print("=" * 60)
+    # Log banner
+    logger.info("=" * 60)
+    logger.info("🌱 SMART FARM NIGERIA - IoT SENSOR SIMULATION")
+    logger.info("=" * 60)
+    logger.info("📞 Support: %s", SUPPORT_PHONE)
+    logger.info("📧 Email: orders@smartfarm.ng")
+    logger.info("🌐 API URL: %s", args.url)
+    logger.info("⏱️ Duration: %s minutes", args.duration)
+    logger.info("📱 Devices: %s", args.devices)
+    logger.info("=" * 60)
     
     # Create devices
     simulator.create_test_devices(args.devices)
     
     # Run simulation
-    simulator.run_simulation(
-        duration_minutes=args.duration,
-        interval_seconds=args.interval,
-        test_orders=args.test_orders,
-        create_user=not args.no_user
-    )
+    try:
+        asyncio.run(simulator.run_simulation(
+            duration_minutes=args.duration,
+            interval_seconds=args.interval,
+            test_orders=args.test_orders,
+            create_user=not args.no_user
+        ))
+    except KeyboardInterrupt:
+        pass  # Already reported by run_simulation
 
 if __name__ == "__main__":
     main()
@@ -474,8 +643,15 @@ python simulate.py --url https://api.smartfarm.ng --duration 120
 # Quiet mode for automated testing
 python simulate.py --quiet --duration 5 --no-user
 
+# Reproducible sensor data
+python simulate.py --seed 42 --duration 5
+
+# Compressed uploads over a slow cellular link
+python simulate.py --gzip --url https://api.smartfarm.ng
+
 Commands to install dependencies:
-pip install requests
+pip install requests aiohttp orjson numpy
+pip install numba  # optional, JIT-compiles the sensor step kernel
 
 Features demonstrated:
 ✅ Realistic sensor data simulation